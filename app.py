@@ -4,13 +4,19 @@ Mark Edwards Apparel Inc.
 Two-file version: Upload Internal PO + Customer Packing List
 """
 
+import io
 import os
 import re
+import time
 import uuid
 from datetime import datetime
+from functools import lru_cache
+
+# Taken before Flask is imported; /ready reports startup timings against it
+IMPORT_STARTED = time.perf_counter()
+
 from flask import Flask, request, send_file, jsonify, redirect, url_for, Response
 from werkzeug.utils import secure_filename
-from PyPDF2 import PdfReader
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
@@ -357,8 +363,16 @@ INDEX_HTML = '''<!DOCTYPE html>
 </html>'''
 
 
+@lru_cache(maxsize=None)
+def compiled(pattern, flags=0):
+    """Compile a regex once per process (warmup fills this before the fork)"""
+    return re.compile(pattern, flags)
+
+
 def extract_text_from_pdf(pdf_path):
-    """Extract text from PDF file"""
+    """Extract text from PDF file (path or file-like object)"""
+    # PyPDF2 is heavy to import; defer it until first use or warmup
+    from PyPDF2 import PdfReader
     reader = PdfReader(pdf_path)
     text = ""
     for page in reader.pages:
@@ -368,6 +382,21 @@ def extract_text_from_pdf(pdf_path):
     return text
 
 
+PO_PATTERNS = [
+    r'Purchase\s+Order\s+Number\s+(\d{6})',
+    r'PO\s*#?\s*:?\s*(\d{6})',
+    r'Order\s+Number[:\s]+(\d{6})',
+]
+PO_FILENAME_PATTERN = r'(\d{6})\.pdf'
+FACTORY_PATTERNS = [
+    r'To\s+([A-Z][A-Z\s]+(?:IMP|EXP|IMPORT|EXPORT|TRADING|FACTORY|MANUFACTURING|MFG|CO\.?\s*,?\s*LTD))',
+    r'NINGBO\s+[\w\s]+',
+    r'SHANGHAI\s+[\w\s]+(?:CO|LTD|TRADING)',
+    r'GUANGZHOU\s+[\w\s]+(?:CO|LTD|TRADING)',
+    r'SHENZHEN\s+[\w\s]+(?:CO|LTD|TRADING)',
+]
+
+
 def extract_internal_po_info(text):
     """Extract PO number and factory name from internal PO document"""
     info = {
@@ -376,34 +405,21 @@ def extract_internal_po_info(text):
     }
     
     # Extract PO number - look for "Purchase Order Number XXXXXX" pattern
-    po_patterns = [
-        r'Purchase\s+Order\s+Number\s+(\d{6})',
-        r'PO\s*#?\s*:?\s*(\d{6})',
-        r'Order\s+Number[:\s]+(\d{6})',
-    ]
-    for pattern in po_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in PO_PATTERNS:
+        match = compiled(pattern, re.IGNORECASE).search(text)
         if match:
             info['po_number'] = match.group(1)
             break
     
     # Also try to get PO from filename pattern if in text
     if not info['po_number']:
-        match = re.search(r'(\d{6})\.pdf', text, re.IGNORECASE)
+        match = compiled(PO_FILENAME_PATTERN, re.IGNORECASE).search(text)
         if match:
             info['po_number'] = match.group(1)
     
     # Extract factory name - look for common patterns in the "To" section
-    factory_patterns = [
-        r'To\s+([A-Z][A-Z\s]+(?:IMP|EXP|IMPORT|EXPORT|TRADING|FACTORY|MANUFACTURING|MFG|CO\.?\s*,?\s*LTD))',
-        r'NINGBO\s+[\w\s]+',
-        r'SHANGHAI\s+[\w\s]+(?:CO|LTD|TRADING)',
-        r'GUANGZHOU\s+[\w\s]+(?:CO|LTD|TRADING)',
-        r'SHENZHEN\s+[\w\s]+(?:CO|LTD|TRADING)',
-    ]
-    
-    for pattern in factory_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+    for pattern in FACTORY_PATTERNS:
+        match = compiled(pattern, re.IGNORECASE).search(text)
         if match:
             factory = match.group(0).strip()
             # Clean up the factory name
@@ -438,21 +454,31 @@ class PackingListSanitizer:
         'total_cartons': [r'FOR\s+(\d+)\s+CARTONS', r'(\d+)\s+CARTONS'],
     }
 
+    FLAGS = re.IGNORECASE | re.MULTILINE
+
     def __init__(self):
         self.detected_info = {}
     
+    @classmethod
+    def compile_patterns(cls):
+        """Compile every redact/keep pattern into the shared regex cache"""
+        for group in (cls.REDACT_PATTERNS, cls.KEEP_PATTERNS):
+            for patterns in group.values():
+                for pattern in patterns:
+                    compiled(pattern, cls.FLAGS)
+    
     def detect_info(self, text):
         info = {'confidential': {}, 'keep': {}}
         for field, patterns in self.REDACT_PATTERNS.items():
             for pattern in patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
+                matches = compiled(pattern, self.FLAGS).findall(text)
                 if matches:
                     if field not in info['confidential']:
                         info['confidential'][field] = []
                     info['confidential'][field].extend(matches if isinstance(matches[0], str) else [m[0] for m in matches])
         for field, patterns in self.KEEP_PATTERNS.items():
             for pattern in patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
+                matches = compiled(pattern, self.FLAGS).findall(text)
                 if matches:
                     if field not in info['keep']:
                         info['keep'][field] = []
@@ -571,6 +597,159 @@ body{{font-family:'Segoe UI',Arial,sans-serif;margin:0;padding:40px;background:#
 </body>
 </html>'''
         return html
+    
+    def verify_output(self, html):
+        """Scan rendered output for any detected confidential value"""
+        return LeakScanner(self.detected_info.get('confidential', {})).scan(html)
+
+
+def normalize_for_scan(text):
+    """Collapse whitespace and fold case so reflowed or re-cased values still match"""
+    return ' '.join(text.split()).casefold()
+
+
+class LeakScanner:
+    """
+    Aho-Corasick automaton over every confidential value from detect_info.
+    Building is linear in the total length of the values and scan() makes a
+    single pass over its input, however many values there are. A value only
+    counts when it appears as a whole token, and values shorter than
+    MIN_NEEDLE_LEN are ignored so stray captures like "PO" cannot match.
+    """
+    MIN_NEEDLE_LEN = 3
+    # Our own letterhead; a customer_name match on exactly this is not a leak
+    ALLOWLIST = ('Mark Edwards Apparel Inc', 'Mark Edwards Apparel Inc.')
+
+    def __init__(self, confidential):
+        allowed = {normalize_for_scan(a) for a in self.ALLOWLIST}
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.needles = []
+        for field, values in confidential.items():
+            for value in values:
+                needle = normalize_for_scan(value)
+                if len(needle) < self.MIN_NEEDLE_LEN or needle in allowed:
+                    continue
+                self._add(needle, len(self.needles))
+                self.needles.append((field, value, needle))
+        self._build_failure_links()
+    
+    def _add(self, needle, index):
+        state = 0
+        for ch in needle:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = nxt
+        self.output[state].append(index)
+    
+    def _build_failure_links(self):
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+    
+    def scan(self, *texts):
+        """Return one report entry per confidential value found in any of texts"""
+        if not self.needles:
+            return []
+        hits = {}
+        goto, fail, output, needles = self.goto, self.fail, self.output, self.needles
+        for text in texts:
+            text = normalize_for_scan(str(text))
+            state = 0
+            for end, ch in enumerate(text):
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+                for index in output[state]:
+                    needle = needles[index][2]
+                    start = end - len(needle) + 1
+                    # Whole tokens only: an alphanumeric edge must not touch another one
+                    if needle[0].isalnum() and start > 0 and text[start - 1].isalnum():
+                        continue
+                    if needle[-1].isalnum() and end + 1 < len(text) and text[end + 1].isalnum():
+                        continue
+                    hits[index] = hits.get(index, 0) + 1
+        return [
+            {'field': self.needles[i][0], 'value': self.needles[i][1], 'count': count}
+            for i, count in sorted(hits.items())
+        ]
+
+
+# Smallest valid one-page PDF; parsing it at warmup pulls in PyPDF2's reader,
+# xref, content-stream and text-extraction code paths before any real upload.
+WARMUP_PDF = (
+    b"%PDF-1.4\n"
+    b"1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 200 50]/Resources<</Font<</F1 4 0 R>>>>/Contents 5 0 R>>endobj\n"
+    b"4 0 obj<</Type/Font/Subtype/Type1/BaseFont/Helvetica>>endobj\n"
+    b"5 0 obj<</Length 63>>stream\n"
+    b"BT /F1 8 Tf 4 20 Td (PO 1234567 12345A BLACK M 6 CARTONS) Tj ET\n"
+    b"endstreamendobj\n"
+    b"xref\n"
+    b"0 6\n"
+    b"0000000000 65535 f \n"
+    b"0000000009 00000 n \n"
+    b"0000000052 00000 n \n"
+    b"0000000101 00000 n \n"
+    b"0000000210 00000 n \n"
+    b"0000000271 00000 n \n"
+    b"trailer<</Size 6/Root 1 0 R>>\n"
+    b"startxref\n"
+    b"379\n"
+    b"%%EOF\n"
+)
+
+# Filled in once by warmup(). With gunicorn preload_app this runs in the master
+# and is inherited read-only by every forked worker; nothing here is mutated
+# after the fork, so workers never need to coordinate.
+WARMUP_STATE = {
+    'ready': False,
+    'pid': None,
+    'import_ms': None,
+    'warmup_ms': None,
+    'time_to_ready_ms': None,
+}
+
+
+def warmup():
+    """Import PyPDF2, compile all patterns and run the pipeline once on WARMUP_PDF"""
+    if WARMUP_STATE['ready']:
+        return WARMUP_STATE
+    started = time.perf_counter()
+    
+    for pattern in PO_PATTERNS + FACTORY_PATTERNS:
+        compiled(pattern, re.IGNORECASE)
+    compiled(PO_FILENAME_PATTERN, re.IGNORECASE)
+    PackingListSanitizer.compile_patterns()
+    
+    text = extract_text_from_pdf(io.BytesIO(WARMUP_PDF))
+    extract_internal_po_info(text)
+    sanitizer = PackingListSanitizer()
+    sanitizer.detect_info(text)
+    sanitizer.verify_output(sanitizer.generate_factory_document('000000'))
+    
+    finished = time.perf_counter()
+    WARMUP_STATE.update({
+        'ready': True,
+        'pid': os.getpid(),
+        'import_ms': round((started - IMPORT_STARTED) * 1000, 1),
+        'warmup_ms': round((finished - started) * 1000, 1),
+        'time_to_ready_ms': round((finished - IMPORT_STARTED) * 1000, 1),
+    })
+    return WARMUP_STATE
 
 
 @app.route('/')
@@ -639,6 +818,9 @@ def process_files():
         customer_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_customer_{customer_filename}")
         customer_file.save(customer_path)
         
+        timings = {}
+        started = time.perf_counter()
+        
         # Extract info from internal PO
         internal_text = extract_text_from_pdf(internal_path)
         internal_info = extract_internal_po_info(internal_text)
@@ -654,9 +836,32 @@ def process_files():
         
         # Process customer packing list
         customer_text = extract_text_from_pdf(customer_path)
+        timings['extract_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        
+        started = time.perf_counter()
         sanitizer = PackingListSanitizer()
         info = sanitizer.detect_info(customer_text)
+        timings['detect_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        
+        started = time.perf_counter()
         html = sanitizer.generate_factory_document(po_number, factory_name)
+        timings['render_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        
+        # Verify nothing confidential made it into the output
+        started = time.perf_counter()
+        leaks = sanitizer.verify_output(html)
+        timings['scan_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        
+        if leaks:
+            os.remove(internal_path)
+            os.remove(customer_path)
+            fields = sorted({leak['field'] for leak in leaks})
+            return jsonify({
+                'success': False,
+                'error': f"Confidential data found in output ({', '.join(fields)}); download blocked",
+                'leaks': leaks,
+                'timings': timings,
+            }), 422
         
         # Save output
         output_filename = f"Factory_Packing_PO_{po_number}_{unique_id}.html"
@@ -676,12 +881,25 @@ def process_files():
             'detected': {
                 'redacted': list(info['confidential'].keys()),
                 'kept': list(info['keep'].keys()),
-            }
+            },
+            'timings': timings,
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/ready')
+def ready():
+    """Readiness probe: 503 until this worker is warm, then startup timings"""
+    if not WARMUP_STATE['ready']:
+        return jsonify({'ready': False}), 503
+    return jsonify({
+        **WARMUP_STATE,
+        'worker_pid': os.getpid(),
+        'preloaded': WARMUP_STATE['pid'] != os.getpid(),
+    })
+
+
 @app.route('/download/<filename>')
 def download_file(filename):
     return send_file(
@@ -693,4 +911,5 @@ def download_file(filename):
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
+    warmup()
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,30 @@
+"""
+Gunicorn settings for the Packing List Sanitizer.
+Picked up automatically from the working directory by `gunicorn app:app`.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Import app.py (Flask, PyPDF2, compiled patterns) once in the master so
+# workers fork already warm instead of each paying the cold start.
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master before workers are forked; without preload the app
+    # must not be imported here, so each worker warms itself instead
+    if not server.cfg.preload_app:
+        return
+    from app import warmup
+    state = warmup()
+    server.log.info("Warm in %sms (import %sms, warmup %sms)",
+                    state['time_to_ready_ms'], state['import_ms'], state['warmup_ms'])
+
+
+def post_worker_init(worker):
+    # Warms each worker when preload_app is off; a no-op when the master already did
+    from app import warmup
+    warmup()
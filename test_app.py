@@ -0,0 +1,98 @@
+"""
+Checks for startup warmup and the post-render leak scanner.
+Run with: python -m pytest -q
+"""
+
+import io
+
+import app
+from app import LeakScanner, PackingListSanitizer, WARMUP_PDF, extract_text_from_pdf
+
+
+def test_warmup_pdf_parses():
+    assert extract_text_from_pdf(io.BytesIO(WARMUP_PDF)).strip() == 'PO 1234567 12345A BLACK M 6 CARTONS'
+
+
+def test_ready_after_warmup(monkeypatch):
+    monkeypatch.setattr(app, 'WARMUP_STATE', {'ready': False})
+    client = app.app.test_client()
+    assert client.get('/ready').status_code == 503
+    app.warmup()
+    response = client.get('/ready')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['ready'] is True
+    for key in ('import_ms', 'warmup_ms', 'time_to_ready_ms', 'pid', 'worker_pid', 'preloaded'):
+        assert key in data
+
+
+def found(confidential, *texts):
+    return {(hit['value'], hit['count']) for hit in LeakScanner(confidential).scan(*texts)}
+
+
+def test_overlapping_needles():
+    confidential = {'customer_sku': ['1234-56', '56-78'], 'customer_po': ['1234-56-78']}
+    assert found(confidential, 'SKU 1234-56-78 here') == {
+        ('1234-56', 1), ('56-78', 1), ('1234-56-78', 1),
+    }
+
+
+def test_needle_that_is_suffix_of_another():
+    confidential = {'customer_name': ['ACME STORES LLC', 'STORES LLC']}
+    assert found(confidential, 'ACME STORES LLC') == {('ACME STORES LLC', 1), ('STORES LLC', 1)}
+    assert found(confidential, 'BIG STORES LLC') == {('STORES LLC', 1)}
+
+
+def test_whitespace_and_case_normalization():
+    confidential = {'addresses': ['100 MAIN STREET, SPRINGFIELD, IL 62701']}
+    assert found(confidential, '100  main\nStreet,\tspringfield, il 62701') == {
+        ('100 MAIN STREET, SPRINGFIELD, IL 62701', 1),
+    }
+
+
+def test_whole_tokens_only():
+    confidential = {'customer_po': ['1234567'], 'pricing': ['$12.50']}
+    assert found(confidential, '912345678') == set()
+    assert found(confidential, 'PO#1234567.') == {('1234567', 1)}
+    assert found(confidential, 'cost $12.50/ctn') == {('$12.50', 1)}
+
+
+def test_short_needles_ignored():
+    assert found({'customer_name': ['PO', 'M']}, 'PO M') == set()
+
+
+def test_allowlist_is_exact_match_only():
+    confidential = {'customer_name': ['MARK EDWARDS APPAREL INC', 'EDWARDS']}
+    assert found(confidential, 'Mark Edwards Apparel Inc') == {('EDWARDS', 1)}
+
+
+def test_clean_document_is_not_blocked():
+    sanitizer = PackingListSanitizer()
+    info = sanitizer.detect_info("MARK EDWARDS APPAREL INC\nCustomer PO# 1234567\nSTYLE 12345A BLACK M\n6 CARTONS")
+    assert {'PO', 'MARK EDWARDS APPAREL INC'} <= set(info['confidential']['customer_name'])
+    html = sanitizer.generate_factory_document('123456')
+    assert sanitizer.verify_output(html) == []
+
+
+def test_leak_through_internal_po_is_blocked():
+    internal = app.extract_internal_po_info("To NINGBO KNITWEAR\nACME STORES LLC\nPurchase Order Number 123456")
+    assert 'ACME' in internal['factory_name']
+    sanitizer = PackingListSanitizer()
+    info = sanitizer.detect_info("ACME STORES LLC\nCustomer PO# 1234567\nSTYLE 12345A BLACK M")
+    assert 'ACME STORES LLC' in info['confidential']['customer_name']
+    html = sanitizer.generate_factory_document(internal['po_number'], internal['factory_name'])
+    leaks = sanitizer.verify_output(html)
+    assert {'field': 'customer_name', 'value': 'ACME STORES LLC', 'count': 1} in leaks
+    assert all(leak['value'] != 'PO' for leak in leaks)
+
+
+def test_leaked_value_is_reported():
+    sanitizer = PackingListSanitizer()
+    sanitizer.detected_info = {
+        'confidential': {'customer_sku': ['1234-12345-1234-123-1234']},
+        'keep': {'vendor_style': ['1234-12345-1234-123-1234']},
+    }
+    html = sanitizer.generate_factory_document('123456')
+    assert sanitizer.verify_output(html) == [
+        {'field': 'customer_sku', 'value': '1234-12345-1234-123-1234', 'count': 1},
+    ]